@@ -1,21 +1,22 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel, Field, ValidationError
-from typing import Optional, List
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List
 import logging
 import os
-import json
 import asyncio
+import orjson
+from contextlib import aclosing, asynccontextmanager, suppress
 from dotenv import load_dotenv
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
 # Load environment variables
 load_dotenv()
 
+# Configure logging; WARNING by default so INFO messages are never formatted
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
+logger = logging.getLogger(__name__)
+
 # Check for required environment variables
 if not os.getenv("GITHUB_TOKEN"):
     raise ValueError("GITHUB_TOKEN not found in environment variables")
@@ -25,7 +26,7 @@ if not os.getenv("OPENAI_API_KEY"):
 from previewer.orchestrator import PRReviewOrchestrator
 from previewer.agents.base import Message
 
-app = FastAPI(title="PReviewer API")
+app = FastAPI(title="PReviewer API", default_response_class=ORJSONResponse)
 
 # Add CORS middleware with more permissive settings for development
 app.add_middleware(
@@ -41,116 +42,208 @@ app.add_middleware(
 class PRReviewRequest(BaseModel):
     pr_url: str = Field(..., description="GitHub PR URL", min_length=1)
 
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "pr_url": "https://github.com/owner/repo/pull/123"
             }
         }
+    )
 
-class PRReviewResponse(BaseModel):
-    success: bool
-    message: str
-    steps: List[str]
-    report: Optional[str] = None
-    error: Optional[str] = None
+# Orchestrators are reused across requests. The pool size caps how many
+# reviews run at once, so a burst of requests waits for a free slot instead of
+# opening unbounded connections to GitHub and OpenAI. Batch reviews hand their
+# slot back while they wait on OpenAI, so they cannot starve streaming reviews.
+ORCHESTRATOR_POOL_SIZE = int(os.getenv("ORCH_POOL", "8"))
+review_slots = asyncio.Semaphore(ORCHESTRATOR_POOL_SIZE)
+idle_orchestrators: List[PRReviewOrchestrator] = []
 
-async def log_message(message: str, message_type: str = "progress"):
-    return f"data: {json.dumps({'type': message_type, 'message': message})}\n\n"
+# How often /api/review checks whether its client is still connected
+DISCONNECT_POLL_INTERVAL = 1.0
 
-async def review_pr_stream(request: PRReviewRequest):
+@asynccontextmanager
+async def released_review_slot():
+    """Give the current review's slot back until the block exits."""
+    review_slots.release()
+    try:
+        yield
+    finally:
+        # Shielded so the slot is always taken back before pooled_orchestrator releases it
+        await asyncio.shield(review_slots.acquire())
+
+def new_orchestrator() -> PRReviewOrchestrator:
+    return PRReviewOrchestrator(batch_wait=released_review_slot)
+
+@app.on_event("startup")
+async def fill_orchestrator_pool():
+    for _ in range(ORCHESTRATOR_POOL_SIZE):
+        idle_orchestrators.append(new_orchestrator())
+
+@asynccontextmanager
+async def pooled_orchestrator():
+    """Take a review slot and an idle orchestrator, returning both afterwards."""
+    async with review_slots:
+        # Batch reviews keep their orchestrator while slotless, so the idle
+        # list can run dry; it then grows by one
+        orchestrator = idle_orchestrators.pop() if idle_orchestrators else new_orchestrator()
+        try:
+            yield orchestrator
+        finally:
+            orchestrator.reset()
+            idle_orchestrators.append(orchestrator)
+
+async def cancel_on_disconnect(request: Request, task: asyncio.Task) -> None:
+    """Cancel the task once the client of a plain request has gone away."""
+    while not task.done():
+        if await request.is_disconnected():
+            logger.info("Client disconnected, cancelling %s", request.url.path)
+            task.cancel()
+            return
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+# Stream events are coalesced into one SSE frame per flush
+STREAM_FLUSH_BYTES = 8192
+STREAM_FLUSH_INTERVAL = 0.025
+
+def log_message(message: str, message_type: str = "progress") -> bytes:
+    """Encode a message as a JSON stream event."""
+    return orjson.dumps({'type': message_type, 'message': message})
+
+def sse_frame(events: List[bytes]) -> bytes:
+    """Wrap encoded events in a single server-sent event frame holding a JSON array."""
+    return b"data: [" + b",".join(events) + b"]\n\n"
+
+async def produce_review_events(request: PRReviewRequest, queue: asyncio.Queue):
+    """Run the review and push each encoded event onto the queue, then None."""
     try:
         # Initialize the review process
-        yield await log_message("Initializing PR Review")
+        await queue.put(log_message("Initializing PR Review"))
         
         # Run the review process
-        orchestrator = PRReviewOrchestrator()
-        async for step in orchestrator.review_pr(request.pr_url):
-            yield await log_message(step)
+        async with pooled_orchestrator() as orchestrator:
+            # Close the review before the orchestrator goes back to the pool,
+            # even when this task is cancelled mid-iteration
+            async with aclosing(orchestrator.review_pr(request.pr_url)) as steps:
+                async for step in steps:
+                    # Review events are already shaped; plain strings are progress
+                    await queue.put(orjson.dumps(step) if isinstance(step, dict) else log_message(step))
             
         # Send completion message
-        yield await log_message("Review completed successfully", "complete")
+        await queue.put(log_message("Review completed successfully", "complete"))
         
     except Exception as e:
         error_msg = str(e)
-        logger.error(f"Error in review process: {error_msg}", exc_info=True)
-        yield await log_message(f"Error: {error_msg}", "error")
+        logger.error("Error in review process: %s", error_msg, exc_info=True)
+        await queue.put(log_message(f"Error: {error_msg}", "error"))
+    finally:
+        await queue.put(None)
 
-@app.post("/api/review/stream")
-async def review_pr_stream_endpoint(request: Request):
+async def review_pr_stream(request: PRReviewRequest):
+    queue: asyncio.Queue = asyncio.Queue()
+    producer = asyncio.create_task(produce_review_events(request, queue))
+    loop = asyncio.get_running_loop()
+    
     try:
-        raw_data = await request.body()
-        logger.info(f"Raw request body: {raw_data}")
-        
-        try:
-            json_data = await request.json()
-            logger.info(f"Parsed JSON data: {json_data}")
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error: {str(e)}")
-            raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
+        finished = False
+        while not finished:
+            # Wait for the next event, then keep buffering until the frame is
+            # large enough or the flush interval has passed
+            event = await queue.get()
+            if event is None:
+                break
+            events = [event]
+            size = len(event)
+            deadline = loop.time() + STREAM_FLUSH_INTERVAL
+            
+            while size < STREAM_FLUSH_BYTES:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if event is None:
+                    finished = True
+                    break
+                events.append(event)
+                size += len(event)
+            
+            yield sse_frame(events)
+    finally:
+        # StreamingResponse cancels this generator as soon as the client
+        # disconnects; cancelling the producer stops every in-flight review
+        producer.cancel()
+        with suppress(asyncio.CancelledError):
+            await producer
 
-        try:
-            review_request = PRReviewRequest(**json_data)
-            logger.info(f"Validated request data: {review_request.dict()}")
-        except ValidationError as e:
-            logger.error(f"Validation error: {str(e)}")
-            raise HTTPException(status_code=422, detail=str(e))
-
-        return StreamingResponse(
-            review_pr_stream(review_request),
-            media_type="text/event-stream"
-        )
-    except Exception as e:
-        if not isinstance(e, HTTPException):
-            logger.error(f"Unexpected error: {str(e)}", exc_info=True)
-            raise HTTPException(status_code=500, detail=str(e))
-        raise
+@app.post("/api/review/stream")
+async def review_pr_stream_endpoint(request: PRReviewRequest):
+    # FastAPI parses and validates the body in one pass, answering 422 on bad input
+    logger.info("Received stream review request for PR: %s", request.pr_url)
+    return StreamingResponse(
+        review_pr_stream(request),
+        media_type="text/event-stream"
+    )
 
-@app.post("/api/review", response_model=PRReviewResponse)
-async def review_pr(request: PRReviewRequest):
-    try:
-        logger.info(f"Received review request for PR: {request.pr_url}")
-        
-        # Initialize orchestrator
-        orchestrator = PRReviewOrchestrator()
-        
-        # Create response object to track progress
-        response = PRReviewResponse(
-            success=True,
-            message="Processing PR review",
-            steps=["Initializing PR Review"],
-            report=None
-        )
-        
+async def batch_review_report(pr_url: str) -> str:
+    """Review a PR with a pooled orchestrator through the Batch API and return the report."""
+    # Wait for a free orchestrator before starting
+    async with pooled_orchestrator() as orchestrator:
         # Review PR
         try:
-            orchestrator.review_pr(request.pr_url)
-            
-            # Get the final report from the orchestrator's state
-            if orchestrator.state.report_analyzer and orchestrator.state.report_analyzer.state.final_reports:
-                pr_number = orchestrator.state.pr_number
-                final_report = orchestrator.state.report_analyzer.state.final_reports.get(pr_number, "No report generated")
-            else:
-                final_report = "No report generated"
-            
-            response.steps.extend([
-                "PR Review Completed",
-                "Report Generated"
-            ])
-            response.report = final_report
-            response.message = "PR review completed successfully"
-            
+            # review_pr is an async generator; drain it on the event loop.
+            # Nobody watches progress here, so use the cheaper Batch API.
+            async with aclosing(orchestrator.review_pr(pr_url, batch=True)) as steps:
+                async for _ in steps:
+                    pass
+        
+            # Get the final report from the orchestrator's state; without one
+            # no file was reviewed, which is a failure rather than a success
+            if orchestrator.state.report is None:
+                raise RuntimeError("No file produced a review")
+            return orchestrator.state.report
+        
         except Exception as e:
-            logger.error(f"Error during PR review: {str(e)}", exc_info=True)
+            logger.error("Error during PR review: %s", e, exc_info=True)
             raise HTTPException(
                 status_code=500,
                 detail=f"Error during PR review: {str(e)}"
             )
+
+@app.post("/api/review")
+async def review_pr(request: PRReviewRequest, http_request: Request):
+    try:
+        logger.info("Received review request for PR: %s", request.pr_url)
         
-        return response
+        # Run the review as its own task so a client that goes away cancels it,
+        # and with it any batch job it is waiting on
+        review = asyncio.create_task(batch_review_report(request.pr_url))
+        watcher = asyncio.create_task(cancel_on_disconnect(http_request, review))
+        try:
+            final_report = await review
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise
+            # Only the review was cancelled: the client is gone, nobody reads this
+            return ORJSONResponse({"success": False, "error": "Client disconnected"}, status_code=499)
+        finally:
+            watcher.cancel()
+        
+        # Returning a Response directly skips response_model validation and the
+        # jsonable_encoder pass
+        return ORJSONResponse({
+            "success": True,
+            "message": "PR review completed successfully",
+            "steps": ["Initializing PR Review", "PR Review Completed", "Report Generated"],
+            "report": final_report,
+            "error": None
+        })
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error processing request: {str(e)}", exc_info=True)
+        logger.error("Error processing request: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Error processing request: {str(e)}"
@@ -158,8 +251,25 @@ async def review_pr(request: PRReviewRequest):
 
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy"}
+    return ORJSONResponse({"status": "healthy"})
 
 if __name__ == "__main__":
+    import argparse
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+
+    parser = argparse.ArgumentParser(description="Run the PReviewer API server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "2")))
+    args = parser.parse_args()
+
+    # uvloop and httptools ship with uvicorn[standard]; an import string is
+    # required so each worker process can load the app itself
+    uvicorn.run(
+        "api:app",
+        host=args.host,
+        port=args.port,
+        loop="uvloop",
+        http="httptools",
+        workers=args.workers
+    )
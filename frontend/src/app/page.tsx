@@ -12,6 +12,11 @@ interface Message {
   content: string
 }
 
+interface StreamEvent {
+  type: 'progress' | 'error' | 'complete' | 'review_start' | 'review_chunk' | 'review_end'
+  message?: string
+}
+
 export default function Home() {
   const [prUrl, setPrUrl] = useState('')
   const [isProcessing, setIsProcessing] = useState(false)
@@ -39,72 +44,62 @@ export default function Home() {
       if (!reader) throw new Error('Failed to initialize stream reader')
 
       const decoder = new TextDecoder()
+      let buffer = ''
+
+      // Reports arrive as review_start, review_chunk... and review_end
+      let reviewBuffer = ''
+
+      // Each SSE frame carries a JSON array of events
+      const handleEvent = (data: StreamEvent) => {
+        if (data.type === 'review_start') {
+          reviewBuffer = ''
+        }
+        else if (data.type === 'review_chunk') {
+          reviewBuffer += data.message ?? ''
+        }
+        else if (data.type === 'review_end') {
+          console.log('Processing review, length:', reviewBuffer.length)
+          const message = reviewBuffer
+            .replace(/\n+/g, '\n')  // Remove extra newlines
+            .replace(/- ([0-9]+\.)/g, '$1')  // Fix numbered list formatting
+            .trim()
+          
+          console.log('Processed review preview:', message.substring(0, 200))
+          setReviewContent(message)
+        }
+        // Handle other messages
+        else if (data.type === 'progress' || data.type === 'error') {
+          console.log('Adding message:', data.type, data.message)
+          const message: Message = { type: data.type, content: data.message ?? '' }
+          setMessages(prev => [...prev, message])
+        }
+
+        if (data.type === 'complete') {
+          console.log('Processing complete')
+          setIsProcessing(false)
+        }
+      }
 
       while (true) {
         const { done, value } = await reader.read()
         if (done) break
 
-        const text = decoder.decode(value)
-        const lines = text.split('\n')
-        console.log('Received lines:', lines)
+        // Frames can be split across reads, so only parse complete ones
+        buffer += decoder.decode(value, { stream: true })
+        const frames = buffer.split('\n\n')
+        buffer = frames.pop() ?? ''
+        console.log('Received frames:', frames.length)
 
-        for (const line of lines) {
-          if (!line.trim() || !line.startsWith('data: ')) continue
+        for (const frame of frames) {
+          if (!frame.trim() || !frame.startsWith('data: ')) continue
           
           try {
-            const jsonStr = line.slice(6)
-            console.log('Processing JSON string:', jsonStr)
-            
-            const data = JSON.parse(jsonStr)
-            console.log('Parsed data:', {
-              type: data.type,
-              messagePreview: data.message?.substring(0, 100),
-            })
-
-            // Check if the message contains a nested review
-            if (data.type === 'progress' && data.message?.startsWith('{"type": "review"')) {
-              try {
-                console.log('Found nested review message')
-                const nestedData = JSON.parse(data.message)
-                if (nestedData.type === 'review') {
-                  console.log('Processing nested review, length:', nestedData.message?.length)
-                  const message = nestedData.message
-                    .replace(/\\n/g, '\n')  // Fix escaped newlines
-                    .replace(/\n+/g, '\n')  // Remove extra newlines
-                    .replace(/- ([0-9]+\.)/g, '$1')  // Fix numbered list formatting
-                    .trim()
-                  
-                  console.log('Processed review preview:', message.substring(0, 200))
-                  setReviewContent(message)
-                }
-              } catch (e) {
-                console.error('Error parsing nested review:', e)
-              }
-            }
-            // Handle regular review message
-            else if (data.type === 'review') {
-              console.log('Processing direct review message')
-              const message = data.message
-                .replace(/\\n/g, '\n')
-                .replace(/\n+/g, '\n')
-                .replace(/- ([0-9]+\.)/g, '$1')
-                .trim()
-              
-              console.log('Processed review preview:', message.substring(0, 200))
-              setReviewContent(message)
-            }
-            // Handle other messages
-            else if (data.type === 'progress' || data.type === 'error') {
-              console.log('Adding message:', data.type, data.message)
-              setMessages(prev => [...prev, { type: data.type, content: data.message }])
-            }
-
-            if (data.type === 'complete') {
-              console.log('Processing complete')
-              setIsProcessing(false)
-            }
+            const jsonStr = frame.slice(6)
+            const parsed = JSON.parse(jsonStr)
+            const events = Array.isArray(parsed) ? parsed : [parsed]
+            events.forEach(handleEvent)
           } catch (e) {
-            console.error('Error parsing message:', e, '\nLine:', line)
+            console.error('Error parsing message:', e, '\nFrame:', frame)
           }
         }
       }
@@ -1,24 +1,55 @@
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Union
+from dataclasses import dataclass
 from enum import Enum
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from datetime import datetime
 
 class MessageType(str, Enum):
     """Types of messages that can be sent between agents."""
-    FILE_ANALYSIS = 'file_analysis'
     REVIEW_REQUEST = 'review_request'
     REVIEW = 'review'
     REPORT = 'report'
     ERROR = 'error'
 
+# Message payloads, one per message type. Slotted dataclasses keep per-file
+# messages small and make fields plain attribute reads instead of dict lookups
+
+@dataclass(slots=True)
+class ReviewRequestPayload:
+    """A file to review, as decoded file_content or raw file_bytes."""
+    file_path: str
+    pr_number: Optional[int] = None
+    file_content: Optional[str] = None
+    file_bytes: Optional[bytes] = None
+
+@dataclass(slots=True)
+class ReviewPayload:
+    """A finished review of a file."""
+    file_path: str
+    review: Dict[str, Any]
+    pr_number: Optional[int] = None
+
+@dataclass(slots=True)
+class ReportPayload:
+    """The report after a file's review was added."""
+    file_path: str
+    report: str
+    pr_number: Optional[int] = None
+
+@dataclass(slots=True)
+class ErrorPayload:
+    """An error reported by an agent."""
+    error: str = 'Unknown error'
+
+Payload = Union[ReviewRequestPayload, ReviewPayload, ReportPayload, ErrorPayload]
+
 class Message(BaseModel):
     """Message passed between agents."""
     type: MessageType
-    content: Dict[str, Any]
+    content: Payload
     source: str
 
-    class Config:
-        arbitrary_types_allowed = True
+    model_config = ConfigDict(arbitrary_types_allowed=True)
 
 class AgentState(BaseModel):
     """State of an agent."""
@@ -27,8 +58,7 @@ class AgentState(BaseModel):
     memory: Dict = {}
     last_message: Optional[Message] = None
 
-    class Config:
-        arbitrary_types_allowed = True
+    model_config = ConfigDict(arbitrary_types_allowed=True)
 
 class BaseAgent:
     """Base class for all agents."""
@@ -37,7 +67,7 @@ class BaseAgent:
         """Initialize agent state."""
         self.state = AgentState()
         
-    def create_message(self, type: MessageType, content: Dict[str, Any], source: str = None) -> Message:
+    def create_message(self, type: MessageType, content: Payload, source: str = None) -> Message:
         """Create a message from this agent."""
         return Message(
             type=type,
@@ -1,33 +1,46 @@
-from typing import List, Set, Dict, Any
+from typing import List, Set, FrozenSet, Dict, Any
+from collections import defaultdict
 import os
-from .base import BaseAgent, AgentState, Message, MessageType
+import re
+from pydantic import ConfigDict
+from .base import BaseAgent, AgentState
 from ..utils.logging_utils import setup_logger
 
 logger = setup_logger("file_analyzer")
 
 class FileAnalyzerState(AgentState):
     """State of the file analyzer."""
-    excluded_extensions: Set[str] = {
+    excluded_extensions: FrozenSet[str] = frozenset({
         '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', 
         '.ttf', '.woff', '.woff2', '.eot', '.pdf',
         '.mp3', '.mp4', '.wav', '.avi', '.mov',
         '.zip', '.tar', '.gz', '.rar',
         '.pyc', '.pyo', '.pyd',
-        '.map', '.min.js', '.min.css'
-    }
+        '.map', '.min.js', '.min.css', '.lock',
+        # Generated protobuf/gRPC code
+        '_pb2.py', '_pb2_grpc.py', '_pb2.pyi', '.pb.go', '.pb.cc', '.pb.h'
+    })
     
-    excluded_directories: Set[str] = {
+    # Lockfiles and other generated files matched by full name
+    excluded_filenames: FrozenSet[str] = frozenset({
+        'package-lock.json', 'npm-shrinkwrap.json', 'pnpm-lock.yaml',
+        'go.sum', 'Pipfile.lock', 'poetry.lock', 'yarn.lock'
+    })
+    
+    excluded_directories: FrozenSet[str] = frozenset({
         'node_modules', 'dist', 'build', 'assets',
         'static', 'public', 'vendor', '.git'
-    }
+    })
+    
+    # Files with larger diffs are skipped rather than fetched and reviewed
+    max_changes: int = int(os.getenv("REVIEW_MAX_CHANGES", "2000"))
     
     processed_files: List[str] = []
     related_files_map: Dict[str, Set[str]] = {}
     analyzed_files: List[str] = []
     files_by_language: Dict[str, List[str]] = {}
 
-    class Config:
-        arbitrary_types_allowed = True
+    model_config = ConfigDict(arbitrary_types_allowed=True)
 
 class FileAnalyzer(BaseAgent):
     """Agent for analyzing files in a PR."""
@@ -37,87 +50,54 @@ class FileAnalyzer(BaseAgent):
         super().__init__()
         self.state = FileAnalyzerState(agent_id='file_analyzer')
         logger.info("Initializing file analyzer")
+        
+        # One case-insensitive pattern matching any excluded directory
+        # component, excluded file name or excluded extension suffix
+        self._excluded_re = re.compile(
+            r'(^|/)(' + '|'.join(map(re.escape, self.state.excluded_directories)) + r')(/|$)'
+            r'|(^|/)(' + '|'.join(map(re.escape, self.state.excluded_filenames)) + r')$'
+            r'|(' + '|'.join(map(re.escape, self.state.excluded_extensions)) + r')$',
+            re.IGNORECASE
+        )
         logger.info("File analyzer initialized")
     
-    def process_message(self, message: Message) -> List[Message]:
-        """Process incoming messages."""
-        if message.type == MessageType.FILE_ANALYSIS:
-            files = message.content.get('files', [])
-            pr_number = message.content.get('pr_number')
-            
-            if not files:
-                logger.warning("No files to analyze")
-                return [Message(
-                    type=MessageType.ERROR,
-                    content={'error': 'No files to analyze'},
-                    source=self.state.agent_id
-                )]
-            
-            logger.info(f"Analyzing {len(files)} files")
-            
-            # Filter relevant files
-            logger.info("Filtering relevant files")
-            relevant_files = []
-            for file in files:
-                logger.info(f"Processing file: {file}")
-                if self._is_relevant_file(file):
-                    logger.info(f"File is relevant: {file}")
-                    relevant_files.append(file)
-                    
-            logger.info(f"Filtered {len(relevant_files)} relevant files")
-            if not relevant_files:
-                logger.warning("No relevant files found")
-                return [Message(
-                    type=MessageType.ERROR,
-                    content={'error': 'No relevant files found'},
-                    source=self.state.agent_id
-                )]
-                
-            # Categorize files by language
-            files_by_language = {}
-            for file in relevant_files:
-                ext = self._get_file_extension(file)
-                if ext not in files_by_language:
-                    files_by_language[ext] = []
-                files_by_language[ext].append(file)
-                logger.info(f"Categorized {file} as {ext}")
-                
-            logger.info(f"Files categorized by language: {files_by_language}")
-            
-            return [Message(
-                type=MessageType.FILE_ANALYSIS,
-                content={
-                    'files_by_language': files_by_language,
-                    'pr_number': pr_number
-                },
-                source=self.state.agent_id
-            )]
+    def group_files(self, files: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+        """
+        Filter out irrelevant files and group the rest by extension, in one pass.
         
-        return [Message(
-            type=MessageType.ERROR,
-            content={'error': f'Unsupported message type: {message.type}'},
-            source=self.state.agent_id
-        )]
+        Takes the PR's file payloads, so removed files and oversized diffs are
+        skipped before any content is fetched.
+        """
+        logger.info("Analyzing %s files", len(files))
+        
+        files_by_language = defaultdict(list)
+        for file in files:
+            file_path = file['filename']
+            if self._is_reviewable_change(file) and self._is_relevant_file(file_path):
+                files_by_language[self._get_file_extension(file_path)].append(file_path)
+                
+        logger.info("Filtered %s relevant files", sum(map(len, files_by_language.values())))
+        return dict(files_by_language)
+    
+    def _is_reviewable_change(self, file: Dict[str, Any]) -> bool:
+        """Check that a changed file still exists and has a text diff small enough to review."""
+        # GitHub leaves out the patch for binary files (reported with 0 changes)
+        # and for diffs too large to render
+        return (
+            file['status'] != 'removed'
+            and 'patch' in file
+            and file['changes'] <= self.state.max_changes
+        )
     
     def _is_relevant_file(self, file_path: str) -> bool:
         """Check if a file is relevant for code review."""
-        logger.info(f"Checking if file is relevant: {file_path}")
-        # Check file extension
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext in self.state.excluded_extensions:
-            logger.info(f"File excluded due to extension: {ext}")
-            return False
-            
-        # Check directory path
-        path_parts = file_path.split(os.path.sep)
-        for part in path_parts:
-            if part.lower() in self.state.excluded_directories:
-                logger.info(f"File excluded due to directory: {part}")
-                return False
-                
-        logger.info(f"File is relevant: {file_path}")
-        return True
+        return self._excluded_re.search(file_path) is None
     
     def _get_file_extension(self, file_path: str) -> str:
         """Get the file extension from a file path."""
-        return os.path.splitext(file_path)[1].lower()
+        # Same result as os.path.splitext for POSIX paths: leading dots in
+        # the file name (e.g. .gitignore) do not start an extension
+        stem, dot, ext = file_path.rpartition('/')[2].rpartition('.')
+        if not dot or not stem.strip('.'):
+            return ''
+        return '.' + ext.lower()
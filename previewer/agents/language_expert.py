@@ -1,23 +1,125 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+from types import MappingProxyType
 import os
+import codecs
+import asyncio
+from posixpath import basename
+import hashlib
 import openai
-from .base import BaseAgent, AgentState, Message, MessageType
+import orjson
+from aiolimiter import AsyncLimiter
+from pydantic import ConfigDict
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+from .base import BaseAgent, AgentState, Message, MessageType, ErrorPayload, ReviewPayload
 from ..utils.logging_utils import setup_logger
+from ..utils.openai_utils import get_openai_client
+from ..utils.cache import TTLCache
 
 logger = setup_logger("language_expert")
 
+# JSON mode needs a GPT-4 model that supports response_format
+MODEL = os.getenv("OPENAI_MODEL", "gpt-4-turbo")
+RESPONSE_FORMAT = {"type": "json_object"}
+
+# Process-wide bounds on OpenAI traffic: at most OPENAI_CONCURRENCY requests in
+# flight and OPENAI_RPM requests started per minute, so fanned-out reviews stay
+# under the provider quota instead of tripping 429s
+_openai_semaphore = asyncio.Semaphore(int(os.getenv("OPENAI_CONCURRENCY", "16")))
+_openai_rate_limiter = AsyncLimiter(int(os.getenv("OPENAI_RPM", "500")), 60)
+
+LANGUAGE_NAMES = MappingProxyType({
+    '.py': 'Python',
+    '.js': 'JavaScript',
+    '.ts': 'TypeScript',
+    '.tsx': 'TypeScript React',
+    '.jsx': 'JavaScript React',
+    '.java': 'Java',
+    '.cpp': 'C++',
+    '.go': 'Go',
+    '.rs': 'Rust',
+    '.rb': 'Ruby',
+    '.php': 'PHP',
+    '.cs': 'C#'
+})
+
+BEST_PRACTICES = MappingProxyType({
+    'Python': (
+        'Use type hints',
+        'Follow PEP 8',
+        'Use meaningful variable names',
+        'Write docstrings',
+        'Handle exceptions properly'
+    ),
+    'JavaScript': (
+        'Use const/let instead of var',
+        'Use === instead of ==',
+        'Handle promises properly',
+        'Use meaningful variable names',
+        'Add proper error handling'
+    ),
+    'TypeScript': (
+        'Use proper type annotations',
+        'Avoid any type',
+        'Use interfaces for object shapes',
+        'Use enums for constants',
+        'Follow naming conventions',
+        'Handle null and undefined properly',
+        'Use async/await for asynchronous code',
+        'Implement proper error handling'
+    ),
+    'TypeScript React': (
+        'Use proper type annotations',
+        'Define prop types using interfaces',
+        'Use functional components with hooks',
+        'Implement proper error boundaries',
+        'Use proper event handling',
+        'Follow React best practices',
+        'Use proper state management',
+        'Handle side effects properly',
+        'Implement proper accessibility',
+        'Use proper component composition'
+    )
+})
+
+# Only this much of a file is sent for review; larger files are truncated
+# (256 KiB is roughly half of a 128k-token context)
+MAX_FILE_BYTES = int(os.getenv("REVIEW_MAX_BYTES", str(256 * 1024)))
+
+# Reviews keyed by (language, content hash), shared by all experts in the process
+_review_cache = TTLCache(
+    maxsize=int(os.getenv("REVIEW_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("REVIEW_CACHE_TTL", "86400"))
+)
+
 class LanguageExpertState(AgentState):
     """State of the language expert."""
     language: str = ""
     reviewed_files: List[str] = []
     reviews: Dict[str, Dict[str, Any]] = {}
 
-    class Config:
-        arbitrary_types_allowed = True
+    model_config = ConfigDict(arbitrary_types_allowed=True)
 
 class LanguageExpert(BaseAgent):
     """Expert agent for reviewing code in a specific language."""
     
+    # Review, best-practice check and suggestions are requested together so the
+    # code is sent once per file and answered in a single JSON reply
+    REVIEW_SYSTEM_PROMPT = """You are a senior {language} developer reviewing code.
+Provide a thorough code review focusing on:
+1. Code quality and best practices
+2. Potential bugs or issues
+3. Performance considerations
+4. Security concerns
+5. Improvement suggestions
+
+Also check if the code follows these best practices:
+{practices}
+
+Respond with a JSON object with exactly these keys:
+- "review": the full review as a string, written in a clear, constructive manner
+- "violations": a list of strings, one per best practice violation found; be specific and list only actual violations
+- "suggestions": a list of strings, one per specific improvement; focus on maintainability, performance, and readability, and be concise and actionable"""
+    
     def __init__(self, language_extension: str):
         """Initialize language expert."""
         super().__init__()
@@ -27,221 +129,212 @@ class LanguageExpert(BaseAgent):
             language=language
         )
         
-        logger.info(f"Initializing language expert for {self.state.language}")
+        logger.info("Initializing language expert for %s", self.state.language)
         
-        # Initialize OpenAI client
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        if not openai_api_key:
-            raise ValueError("OPENAI_API_KEY environment variable not set")
-        openai.api_key = openai_api_key
+        # The language is fixed per expert, so render the system prompt once
+        self._review_system_prompt = self.REVIEW_SYSTEM_PROMPT.format(
+            language=language,
+            practices='\n'.join(f'- {p}' for p in self._load_best_practices(language))
+        )
         
-        logger.info(f"Language expert initialized for {self.state.language}")
+        logger.info("Language expert initialized for %s", self.state.language)
+    
+    def reset(self):
+        """Forget reviewed files so the expert can serve another PR."""
+        self.state.reviewed_files = []
+        self.state.reviews = {}
     
-    def process_message(self, message: Message) -> Message:
+    async def process_message(self, message: Message) -> Message:
         """Process incoming messages."""
         if message.type == MessageType.REVIEW_REQUEST:
-            file_path = message.content.get('file_path')
-            file_content = message.content.get('file_content')
-            pr_number = message.content.get('pr_number')
+            file_path = message.content.file_path
+            file_content = self.review_text(message)
+            pr_number = message.content.pr_number
             
             if not file_path or not file_content:
                 logger.error("Missing file path or content in review request")
                 return Message(
                     type=MessageType.ERROR,
-                    content={'error': 'Missing file path or content'},
+                    content=ErrorPayload('Missing file path or content'),
                     source=self.state.agent_id
                 )
             
-            logger.info(f"Reviewing file: {file_path}")
+            logger.debug("Reviewing file: %s", file_path)
             try:
-                review = self._review_code(file_path, file_content)
-                self.state.reviewed_files.append(file_path)
-                self.state.reviews[file_path] = review
-                
-                return Message(
-                    type=MessageType.REVIEW,
-                    content={
-                        'file_path': file_path,
-                        'review': review,
-                        'pr_number': pr_number
-                    },
-                    source=self.state.agent_id
-                )
+                review = await self._review_code(file_path, file_content)
+                return self._review_result(file_path, review, pr_number)
             except Exception as e:
-                logger.error(f"Error reviewing {file_path}: {str(e)}")
+                logger.error("Error reviewing %s: %s", file_path, e)
                 return Message(
                     type=MessageType.ERROR,
-                    content={'error': str(e)},
+                    content=ErrorPayload(str(e)),
                     source=self.state.agent_id
                 )
         
         return Message(
             type=MessageType.ERROR,
-            content={'error': f'Unsupported message type: {message.type}'},
+            content=ErrorPayload(f'Unsupported message type: {message.type}'),
             source=self.state.agent_id
         )
     
-    def _review_code(self, file_path: str, code: str) -> Dict:
-        """Review code using OpenAI."""
-        logger.info(f"Starting comprehensive review of {file_path}")
+    @staticmethod
+    def review_text(message: Message) -> str:
+        """
+        Return the code to review from a review request, at most MAX_FILE_BYTES of it.
+
+        Requests carry either decoded file_content or raw file_bytes; bytes are
+        only decoded up to the limit. Text is limited by its UTF-8 size too, so
+        both forms of the same file give the same code (and cache key).
+        """
+        file_bytes = message.content.file_bytes
+        if file_bytes is None:
+            file_content = message.content.file_content or ''
+            # Every character takes at most 4 bytes, so short text is never over
+            if len(file_content) <= MAX_FILE_BYTES // 4:
+                return file_content
+            file_bytes = file_content.encode('utf-8')
         
-        # Extract just the filename without full path for OpenAI prompt
-        filename = file_path.split('/')[-1]
+        if len(file_bytes) <= MAX_FILE_BYTES:
+            return file_bytes.decode('utf-8', errors='replace')
+        
+        logger.warning("Truncating %s to %s bytes for review", message.content.file_path, MAX_FILE_BYTES)
+        # A non-final incremental decode holds back a character cut off by the limit
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        return decoder.decode(file_bytes[:MAX_FILE_BYTES], final=False)
+    
+    def review_messages(self, file_path: str, code: str) -> List[Dict[str, str]]:
+        """Build the chat messages for reviewing a file."""
+        # Extract just the filename for the OpenAI prompt; GitHub paths always use '/'
+        filename = basename(file_path)
         
-        system_prompt = f"""You are a senior {self.state.language} developer reviewing code.
-Provide a thorough code review focusing on:
-1. Code quality and best practices
-2. Potential bugs or issues
-3. Performance considerations
-4. Security concerns
-5. Improvement suggestions
-
-Format your review in a clear, constructive manner."""
-
         user_prompt = f"""Review this {self.state.language} code from {filename}:
 
 {code}"""
 
+        return [
+            {"role": "system", "content": self._review_system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def cached_review(self, message: Message) -> Optional[Message]:
+        """Return a review message for the request if its content was already reviewed."""
+        review = _review_cache.get(self._cache_key(self.review_text(message)))
+        if review is None:
+            return None
+        
+        file_path = message.content.file_path
+        logger.debug("Using cached review for %s", file_path)
+        return self._review_result(file_path, review, message.content.pr_number)
+    
+    def process_batch_output(self, message: Message, output: Optional[str]) -> Message:
+        """Turn the batch reply for a review request into a review message."""
+        file_path = message.content.file_path
         try:
-            logger.info("Requesting code review from OpenAI")
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ]
+            if not output:
+                raise ValueError("Batch returned no output")
+            review = self._parse_review(output)
+        except Exception as e:
+            logger.error("Error reviewing %s: %s", file_path, e)
+            return Message(
+                type=MessageType.ERROR,
+                content=ErrorPayload(str(e)),
+                source=self.state.agent_id
+            )
+        
+        _review_cache.set(self._cache_key(self.review_text(message)), review)
+        return self._review_result(file_path, review, message.content.pr_number)
+    
+    def _review_result(self, file_path: str, review: Dict, pr_number: Optional[int]) -> Message:
+        """Record a finished review and wrap it in a review message."""
+        self.state.reviewed_files.append(file_path)
+        self.state.reviews[file_path] = review
+        
+        return Message(
+            type=MessageType.REVIEW,
+            content=ReviewPayload(file_path, review, pr_number),
+            source=self.state.agent_id
+        )
+    
+    def _cache_key(self, code: str) -> tuple:
+        """Key a review by language and a digest of the reviewed code."""
+        return (self.state.language, hashlib.blake2b(code.encode('utf-8'), digest_size=16).hexdigest())
+    
+    @staticmethod
+    @retry(
+        wait=wait_exponential_jitter(),
+        stop=stop_after_attempt(5),
+        # The shared client does not retry on its own, so transient failures are retried here
+        retry=retry_if_exception_type((
+            openai.RateLimitError,
+            openai.APIConnectionError,
+            openai.APITimeoutError,
+            openai.InternalServerError
+        )),
+        reraise=True
+    )
+    async def _complete(messages: List[Dict[str, str]]) -> str:
+        """Run a single JSON-mode chat completion and return the reply text."""
+        async with _openai_rate_limiter, _openai_semaphore:
+            response = await get_openai_client().chat.completions.create(
+                model=MODEL,
+                messages=messages,
+                response_format=RESPONSE_FORMAT
+            )
+        return response.choices[0].message.content
+    
+    @classmethod
+    def _parse_review(cls, text: str) -> Dict:
+        """Parse the model's JSON reply into the review structure used by reports."""
+        data = orjson.loads(text)
+        if not isinstance(data, dict):
+            raise ValueError("Review response is not a JSON object")
+        
+        return {
+            'review': str(data.get('review', '')),
+            'best_practices_violations': cls._as_lines(data.get('violations')),
+            'suggestions': cls._as_lines(data.get('suggestions'))
+        }
+    
+    @staticmethod
+    def _as_lines(value: Any) -> List[str]:
+        """Normalize a list (or newline-separated string) of items to non-empty lines."""
+        if isinstance(value, str):
+            value = value.split('\n')
+        if not isinstance(value, list):
+            return []
+        return [str(item).strip() for item in value if str(item).strip()]
+    
+    async def _review_code(self, file_path: str, code: str) -> Dict:
+        """Review code using OpenAI."""
+        cache_key = self._cache_key(code)
+        cached = _review_cache.get(cache_key)
+        if cached is not None:
+            logger.debug("Using cached review for %s", file_path)
+            return cached
+        
+        logger.debug("Starting comprehensive review of %s", file_path)
+        try:
+            logger.debug("Requesting code review from OpenAI")
+            result = self._parse_review(await self._complete(self.review_messages(file_path, code)))
+            logger.debug(
+                "Received code review from OpenAI with %s violations and %s suggestions",
+                len(result['best_practices_violations']),
+                len(result['suggestions'])
             )
-            review = response.choices[0].message.content
-            logger.info("Received code review from OpenAI")
-            
-            # Check best practices
-            logger.info("Checking best practices")
-            violations = self._check_best_practices(code)
-            
-            # Generate suggestions
-            logger.info("Generating improvement suggestions")
-            suggestions = self._generate_suggestions(code)
             
-            return {
-                'review': review,
-                'best_practices_violations': violations,
-                'suggestions': suggestions
-            }
+            _review_cache.set(cache_key, result)
+            return result
             
         except Exception as e:
-            logger.error(f"Error during code review: {str(e)}")
+            logger.error("Error during code review: %s", e)
             raise
     
     @staticmethod
     def _get_language_name(ext: str) -> str:
         """Map file extension to programming language."""
-        language_map = {
-            '.py': 'Python',
-            '.js': 'JavaScript',
-            '.ts': 'TypeScript',
-            '.tsx': 'TypeScript React',
-            '.jsx': 'JavaScript React',
-            '.java': 'Java',
-            '.cpp': 'C++',
-            '.go': 'Go',
-            '.rs': 'Rust',
-            '.rb': 'Ruby',
-            '.php': 'PHP',
-            '.cs': 'C#'
-        }
-        return language_map.get(ext, 'Unknown')
+        return LANGUAGE_NAMES.get(ext, 'Unknown')
     
     @staticmethod
     def _load_best_practices(language: str) -> List[str]:
         """Load language-specific best practices."""
-        practices = {
-            'Python': [
-                'Use type hints',
-                'Follow PEP 8',
-                'Use meaningful variable names',
-                'Write docstrings',
-                'Handle exceptions properly'
-            ],
-            'JavaScript': [
-                'Use const/let instead of var',
-                'Use === instead of ==',
-                'Handle promises properly',
-                'Use meaningful variable names',
-                'Add proper error handling'
-            ],
-            'TypeScript': [
-                'Use proper type annotations',
-                'Avoid any type',
-                'Use interfaces for object shapes',
-                'Use enums for constants',
-                'Follow naming conventions',
-                'Handle null and undefined properly',
-                'Use async/await for asynchronous code',
-                'Implement proper error handling'
-            ],
-            'TypeScript React': [
-                'Use proper type annotations',
-                'Define prop types using interfaces',
-                'Use functional components with hooks',
-                'Implement proper error boundaries',
-                'Use proper event handling',
-                'Follow React best practices',
-                'Use proper state management',
-                'Handle side effects properly',
-                'Implement proper accessibility',
-                'Use proper component composition'
-            ]
-        }
-        return practices.get(language, [])
-    
-    def _check_best_practices(self, content: str) -> List[str]:
-        """Check code against language-specific best practices."""
-        logger.info(f"Checking best practices for {self.state.language}")
-        system_prompt = f"""You are a {self.state.language} best practices analyzer. 
-Check if the code follows these best practices:
-{chr(10).join(f'- {p}' for p in self._load_best_practices(self.state.language))}
-List only the violations found, be specific."""
-
-        user_prompt = f"Code to analyze:\n```{self.state.language}\n{content}\n```"
-
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ]
-            )
-            
-            violations = [v.strip() for v in response.choices[0].message.content.split('\n') if v.strip()]
-            logger.info(f"Found {len(violations)} best practice violations")
-            return violations
-        except Exception as e:
-            logger.error(f"Error checking best practices: {str(e)}", exc_info=True)
-            raise
-    
-    def _generate_suggestions(self, content: str) -> List[str]:
-        """Generate improvement suggestions for the code."""
-        logger.info("Generating improvement suggestions")
-        system_prompt = f"""You are a {self.state.language} code improvement expert. 
-Suggest specific improvements to make the code better. 
-Focus on maintainability, performance, and readability. 
-Be concise and actionable."""
-
-        user_prompt = f"Code to improve:\n```{self.state.language}\n{content}\n```"
-
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ]
-            )
-            
-            suggestions = [s.strip() for s in response.choices[0].message.content.split('\n') if s.strip()]
-            logger.info(f"Generated {len(suggestions)} improvement suggestions")
-            return suggestions
-        except Exception as e:
-            logger.error(f"Error generating suggestions: {str(e)}", exc_info=True)
-            raise
+        return list(BEST_PRACTICES.get(language, ()))
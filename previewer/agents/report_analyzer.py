@@ -1,7 +1,6 @@
 from typing import Dict, List, Any
-import os
-import openai
-from .base import BaseAgent, AgentState, Message, MessageType
+from pydantic import ConfigDict
+from .base import BaseAgent, AgentState, Message, MessageType, ErrorPayload, ReportPayload
 from ..utils.logging_utils import setup_logger
 
 logger = setup_logger("report_analyzer")
@@ -10,8 +9,7 @@ class ReportAnalyzerState(AgentState):
     """State of the report analyzer."""
     reports: List[Dict[str, Any]] = []
 
-    class Config:
-        arbitrary_types_allowed = True
+    model_config = ConfigDict(arbitrary_types_allowed=True)
 
 class ReportAnalyzer(BaseAgent):
     """Agent for analyzing and formatting review reports."""
@@ -26,35 +24,35 @@ class ReportAnalyzer(BaseAgent):
         self.state = ReportAnalyzerState(agent_id='report_analyzer')
         logger.info("Initializing report analyzer")
         logger.info("Report analyzer initialized")
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        if not openai_api_key:
-            logger.error("OPENAI_API_KEY not found in environment variables")
-            raise ValueError("OPENAI_API_KEY not found in environment variables")
-            
-        openai.api_key = openai_api_key
+    
+    def reset(self):
+        """Forget collected reviews so the analyzer can serve another PR."""
+        self.state.reports = []
     
     def process_message(self, message: Message) -> List[Message]:
         """Process incoming messages and generate reports."""
         if message.type == MessageType.REVIEW:
-            file_path = message.content.get('file_path')
-            review = message.content.get('review')
-            pr_number = message.content.get('pr_number')
+            file_path = message.content.file_path
+            review = message.content.review
+            pr_number = message.content.pr_number
             
             if not file_path or not review:
                 logger.error("Missing file path or review in message")
                 return [self.create_message(
                     MessageType.ERROR,
-                    {'error': 'Missing file path or review'},
+                    ErrorPayload('Missing file path or review'),
                     'orchestrator'
                 )]
             
-            logger.info(f"Processing review for {file_path}")
+            logger.debug("Processing review for %s", file_path)
             
-            # Store review
+            # Store review with its section formatted once, so each report only
+            # joins finished sections instead of reformatting every file
             self.state.reports.append({
                 'file_path': file_path,
                 'review': review,
-                'pr_number': pr_number
+                'pr_number': pr_number,
+                'section': self._format_review(file_path, review)
             })
             
             # Generate report
@@ -62,23 +60,19 @@ class ReportAnalyzer(BaseAgent):
             
             return [self.create_message(
                 MessageType.REPORT,
-                {
-                    'file_path': file_path,
-                    'report': report,
-                    'pr_number': pr_number
-                },
+                ReportPayload(file_path, report, pr_number),
                 'orchestrator'
             )]
         
         return [self.create_message(
             MessageType.ERROR,
-            {'error': f'Unsupported message type: {message.type}'},
+            ErrorPayload(f'Unsupported message type: {message.type}'),
             'orchestrator'
         )]
     
     def _generate_report(self, file_path: str, review: Dict) -> str:
         """Generate a comprehensive report from individual file reviews."""
-        logger.info(f"Starting report generation for {file_path}")
+        logger.debug("Starting report generation for %s", file_path)
         
         # Format the review into a GitHub-friendly markdown comment
         report = "# PR Review Report\n\n"
@@ -96,44 +90,41 @@ class ReportAnalyzer(BaseAgent):
     
     def _collect_reviews(self) -> str:
         """Collect all reviews into a single text."""
-        logger.info("Collecting all reviews")
-        reviews_text = []
+        logger.debug("Collecting all reviews")
+        return "\n\n".join(review_data['section'] for review_data in self.state.reports)
+    
+    @staticmethod
+    def _format_review(file_path: str, review: Dict) -> str:
+        """Format a single file's review as a markdown section."""
+        # Extract review components
+        general_review = review.get('review', '')
+        violations = review.get('best_practices_violations', [])
+        suggestions = review.get('suggestions', [])
         
-        for review_data in self.state.reports:
-            logger.info(f"Processing review for {review_data['file_path']}")
-            review = review_data.get('review', {})
-            
-            # Extract review components
-            general_review = review.get('review', '')
-            violations = review.get('best_practices_violations', [])
-            suggestions = review.get('suggestions', [])
-            
-            # Format the review
-            file_review = [
-                f"\n## Review for {review_data['file_path']}",
-                "\n### General Review",
-                general_review
-            ]
-            
-            if violations:
-                file_review.extend([
-                    "\n### Best Practice Violations",
-                    "- " + "\n- ".join(violations)
-                ])
-            
-            if suggestions:
-                file_review.extend([
-                    "\n### Improvement Suggestions",
-                    "- " + "\n- ".join(suggestions)
-                ])
-            
-            reviews_text.append("\n".join(file_review))
+        # Format the review
+        file_review = [
+            f"\n## Review for {file_path}",
+            "\n### General Review",
+            general_review
+        ]
+        
+        if violations:
+            file_review.extend([
+                "\n### Best Practice Violations",
+                "- " + "\n- ".join(violations)
+            ])
+        
+        if suggestions:
+            file_review.extend([
+                "\n### Improvement Suggestions",
+                "- " + "\n- ".join(suggestions)
+            ])
         
-        return "\n\n".join(reviews_text)
+        return "\n".join(file_review)
     
     def _format_github_comment(self, summary: str) -> str:
         """Format the summary as a GitHub comment."""
-        logger.info("Formatting report as GitHub comment")
+        logger.debug("Formatting report as GitHub comment")
         return f"""# Pull Request Review Summary
 
 {summary}
@@ -1,257 +1,436 @@
-from typing import Dict, List, Optional
+from typing import Any, AsyncContextManager, Callable, Dict, List, Optional, Set, Tuple, Union
+from dataclasses import dataclass, field
 import os
-import json
+import logging
+import asyncio
+import contextlib
 from github import Github
-from pydantic import BaseModel
 
-from .agents.language_expert import LanguageExpert
+from .agents.language_expert import LanguageExpert, MODEL, RESPONSE_FORMAT
 from .agents.file_analyzer import FileAnalyzer
 from .agents.report_analyzer import ReportAnalyzer
-from .agents.base import Message, MessageType
+from .agents.base import Message, MessageType, ReviewRequestPayload
 from .utils.logging_utils import setup_logger
-from .utils.github_utils import post_pr_comment, get_pr_file_content
+from .utils.github_utils import blob_cache, extract_repo_info, post_pr_comment, get_pr_file_content
+from .utils.github_graphql import fetch_blobs
+from .utils.github_async import AsyncGithub
+from .utils.openai_utils import get_openai_client
+from .utils.openai_batch import BatchProcessor
 
 logger = setup_logger("orchestrator")
 
-class PRReviewOrchestratorState(BaseModel):
+# Files fetched and reviewed at once within a single PR review
+FILE_REVIEW_CONCURRENCY = 8
+
+# Marks the end of a review's event queue
+SENTINEL = object()
+
+# Characters per review_chunk event when streaming a report
+REPORT_CHUNK_SIZE = 4096
+
+# Leading bytes of a REST-fetched file searched for a NUL to detect binaries
+BINARY_SNIFF_BYTES = 8000
+
+@dataclass(slots=True)
+class PRReviewOrchestratorState:
+    """Per-review state of the orchestrator; internal only, so not a validated model."""
     pr_url: Optional[str] = None
     repo_name: Optional[str] = None
     pr_number: Optional[int] = None
     github: Optional[Github] = None
+    github_token: Optional[str] = None
+    pr: Optional[Dict[str, Any]] = None
+    pr_files_by_name: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    file_contents: Dict[str, Union[str, bytes]] = field(default_factory=dict)
     file_analyzer: Optional[FileAnalyzer] = None
-    language_experts: Dict[str, LanguageExpert] = {}
+    language_experts: Dict[str, LanguageExpert] = field(default_factory=dict)
     report_analyzer: Optional[ReportAnalyzer] = None
+    report: Optional[str] = None
     status: str = "ready"
 
-    class Config:
-        arbitrary_types_allowed = True
-
-class PRReviewOrchestrator(BaseModel):
-    state: PRReviewOrchestratorState = PRReviewOrchestratorState()
-
-    class Config:
-        arbitrary_types_allowed = True
-
-    def __init__(self):
+class PRReviewOrchestrator:
+    def __init__(self, batch_wait: Optional[Callable[[], AsyncContextManager]] = None):
+        """Create an orchestrator.
+        
+        batch_wait, if given, is entered while a batch review waits on OpenAI,
+        e.g. to give a concurrency slot back for the length of the wait.
+        """
         logger.info("Initializing PR Review Orchestrator")
-        super().__init__()
+        self.state = PRReviewOrchestratorState()
+        self.batch_wait = batch_wait
+        self._init()
+    
+    def reset(self):
+        """Clear per-review state so the orchestrator can be reused."""
+        self.state.pr_url = None
+        self.state.repo_name = None
+        self.state.pr_number = None
+        self.state.pr = None
+        self.state.pr_files_by_name = {}
+        self.state.file_contents = {}
+        self.state.report = None
+        self.state.status = "ready"
+        if self.state.report_analyzer:
+            self.state.report_analyzer.reset()
+        for expert in self.state.language_experts.values():
+            expert.reset()
+    
+    async def review_pr(self, pr_url: str, batch: bool = False):
+        """Review a pull request and generate a comprehensive report.
         
-        github_token = os.getenv("GITHUB_TOKEN")
-        if not github_token:
-            logger.error("GITHUB_TOKEN not found in environment variables")
-            raise ValueError("GITHUB_TOKEN not found in environment variables")
-            
-        logger.info("Initializing GitHub client")
-        self.state.github = Github(github_token)
+        With batch=True all review prompts are submitted as one OpenAI Batch API
+        job instead of interactive requests, trading latency for cost.
         
-        logger.info("Initializing agents")
-        self.state.file_analyzer = FileAnalyzer()
-        self.state.report_analyzer = ReportAnalyzer()
-        logger.info("Initialization complete")
+        Yields progress strings, and each report as review_start, review_chunk
+        and review_end event dicts.
+        """
+        # The review runs as a producer task pushing onto one queue; this
+        # generator only drains it until SENTINEL
+        queue: asyncio.Queue = asyncio.Queue()
+        producer = asyncio.create_task(self._run_review(pr_url, queue, batch))
+        try:
+            while (item := await queue.get()) is not SENTINEL:
+                yield item
+            # Re-raise anything the review failed with
+            await producer
+        finally:
+            # Wait for the review's own cleanup, so it never runs after the
+            # orchestrator has been reset and handed to the next review
+            producer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await producer
     
-    async def review_pr(self, pr_url: str):
-        """Review a pull request and generate a comprehensive report."""
-        logger.info(f"Starting review of PR: {pr_url}")
+    async def _run_review(self, pr_url: str, queue: asyncio.Queue, batch: bool) -> None:
+        """Run the review, pushing progress onto the queue and SENTINEL when done."""
+        logger.info("Starting review of PR: %s", pr_url)
         self.state.pr_url = pr_url
         self.state.status = "reviewing"
         
         try:
-            # Extract PR info
-            logger.info("Initializing PR Review Orchestrator")
-            yield "Initializing PR Review"
-            
-            # Initialize GitHub client
-            logger.info("Initializing GitHub client")
-            self._init_github()
+            await queue.put("Initializing PR Review")
             
-            # Initialize agents
-            logger.info("Initializing agents")
-            self._init_agents()
-            
-            logger.info("Initialization complete")
-            
-            # Start PR review
-            logger.info(f"Starting review of PR: {pr_url}")
+            # __init__ already set everything up; only re-init if a client was dropped
+            if self.state.github is None or self.state.file_analyzer is None or self.state.report_analyzer is None:
+                self._init()
             
             # Extract PR information from URL
             logger.info("Extracting PR information from URL")
-            yield "Extracting PR information"
-            self.state.repo_name = self._extract_repo_name(pr_url)
-            self.state.pr_number = int(pr_url.split('/')[-1])
-            logger.info(f"Extracted PR info - Repo: {self.state.repo_name}, PR: {self.state.pr_number}")
+            await queue.put("Extracting PR information")
+            owner, repo_name, pr_number = extract_repo_info(pr_url)
+            self.state.repo_name = f"{owner}/{repo_name}"
+            self.state.pr_number = pr_number
+            logger.info("Extracted PR info - Repo: %s, PR: %s", self.state.repo_name, self.state.pr_number)
             
             # Fetch PR from GitHub
             logger.info("Fetching PR from GitHub")
-            yield "Fetching PR from GitHub"
-            repo = self.state.github.get_repo(self.state.repo_name)
-            pr = repo.get_pull(self.state.pr_number)
-            logger.info(f"Found PR: {pr.title}")
-            
-            # Get files from PR
-            logger.info("Fetching PR files from GitHub")
-            yield "Fetching PR files"
-            files = [f.filename for f in pr.get_files()]
-            logger.info(f"Found {len(files)} files to analyze")
-            
-            # Send files to FileAnalyzer
-            logger.info("Sending files to FileAnalyzer")
-            if not files:
-                logger.warning("No files found in PR")
-                yield "No files found to analyze"
-                return
+            await queue.put("Fetching PR from GitHub")
+            # The PR and its file list are fetched once and reused for every file.
+            # All GitHub calls in this review share one keep-alive session, which
+            # is closed when this review ends
+            async with AsyncGithub(self.state.github_token) as github:
+                pr = await github.fetch_pr(self.state.repo_name, self.state.pr_number)
+                self.state.pr = pr
+                logger.info("Found PR: %s", pr['title'])
                 
-            response = self.state.file_analyzer.process_message(Message(
-                type=MessageType.FILE_ANALYSIS,
-                content={
-                    'files': files,
-                    'pr_number': self.state.pr_number
-                },
-                source='orchestrator'
-            ))
-            
-            # Process file analyzer responses
-            for response in response:
-                logger.info(f"Received response of type: {response.type}")
-                if response.type == MessageType.FILE_ANALYSIS:
-                    logger.info("Received file analysis results")
-                    yield "Processing file analysis results"
-                    async for progress in self._handle_file_analysis(response, pr):
-                        yield progress
-                elif response.type == MessageType.ERROR:
-                    error_msg = response.content.get('error', 'Unknown error')
-                    logger.error(f"Error from FileAnalyzer: {error_msg}")
-                    yield f"Error during file analysis: {error_msg}"
-            
-            if not response:
-                logger.warning("No responses received from FileAnalyzer")
-                yield "No files to analyze"
+                # Get files from PR
+                logger.info("Fetching PR files from GitHub")
+                await queue.put("Fetching PR files")
+                pr_files = await github.list_files(self.state.repo_name, self.state.pr_number, pr.get('changed_files'))
+                self.state.pr_files_by_name = {f['filename']: f for f in pr_files}
+                logger.info("Found %s files to analyze", len(pr_files))
+                
+                if not pr_files:
+                    logger.warning("No files found in PR")
+                    await queue.put("No files found to analyze")
+                    return
+                
+                # Filter and group files directly rather than through a message round-trip
+                files_by_language = self.state.file_analyzer.group_files(pr_files)
+                if files_by_language:
+                    await queue.put("Processing file analysis results")
+                    await self._handle_file_analysis(github, files_by_language, queue, batch)
+                else:
+                    logger.warning("No relevant files found")
+                    await queue.put("Error during file analysis: No relevant files found")
             
             self.state.status = "done"
             logger.info("PR review completed successfully")
-            yield "Review completed successfully"
+            await queue.put("Review completed successfully")
             
         except Exception as e:
             error_msg = str(e)
-            logger.error(f"Error during PR review: {error_msg}", exc_info=True)
-            yield f"Error during PR review: {error_msg}"
+            logger.error("Error during PR review: %s", error_msg, exc_info=True)
+            await queue.put(f"Error during PR review: {error_msg}")
             raise
+        finally:
+            queue.put_nowait(SENTINEL)
     
-    async def _handle_file_analysis(self, message: Message, pr) -> None:
-        """Handle file analysis results and initiate code reviews."""
+    async def _handle_file_analysis(self, github: AsyncGithub, files_by_language: Dict[str, List[str]],
+                                    queue: asyncio.Queue, batch: bool = False) -> None:
+        """Review the grouped files, pushing progress onto the queue."""
         logger.info("Handling file analysis results")
-        
-        files_by_language = message.content.get('files_by_language', {})
-        if not files_by_language:
-            logger.warning("No files to process in analysis results")
-            return
 
+        # One job per file; files are independent, so they are reviewed concurrently
+        jobs = []
         for extension, files in files_by_language.items():
-            logger.info(f"Processing {len(files)} {extension} files")
-            yield f"Processing {len(files)} {extension} files"
+            logger.info("Processing %s %s files", len(files), extension)
+            await queue.put(f"Processing {len(files)} {extension} files")
 
-            # Create new language expert
-            logger.info(f"Creating new {extension} expert")
-            expert = LanguageExpert(extension)
-            
-            # Process each file
-            for file_path in files:
-                logger.info(f"Processing {file_path}")
+            # Experts are kept for the orchestrator's lifetime, one per extension
+            expert = self.state.language_experts.get(extension)
+            if expert is None:
+                logger.info("Creating new %s expert", extension)
+                expert = LanguageExpert(extension)
+                self.state.language_experts[extension] = expert
+            jobs.extend((extension, file_path, expert) for file_path in files)
+
+        # Prefetch every file in a few GraphQL queries instead of one REST call each
+        self.state.file_contents, binary = await self._prefetch_contents(github, [file_path for _, file_path, _ in jobs])
+        if binary:
+            # Binary files would reach the model as garbled text, so never review them
+            logger.info("Skipping %s binary files", len(binary))
+            jobs = [job for job in jobs if job[1] not in binary]
+
+        if batch:
+            await self._batch_review_files(github, jobs, queue)
+        else:
+            # Reviews report progress as they complete, so the stream is
+            # ordered by completion rather than by file
+            await self._review_files(github, jobs, queue)
+    
+    async def _review_files(self, github: AsyncGithub, jobs: List, queue: asyncio.Queue) -> None:
+        """Review every job concurrently, at most FILE_REVIEW_CONCURRENCY at a time."""
+        semaphore = asyncio.Semaphore(FILE_REVIEW_CONCURRENCY)
+        # The task group ties the reviews to the review task, so cancelling the
+        # review (e.g. the client went away) cancels every OpenAI call
+        async with asyncio.TaskGroup() as tg:
+            for extension, file_path, expert in jobs:
+                tg.create_task(self._review_one_file(github, extension, file_path, expert, queue, semaphore))
+    
+    async def _review_one_file(self, github: AsyncGithub, extension: str, file_path: str, expert: LanguageExpert,
+                               queue: asyncio.Queue, semaphore: asyncio.Semaphore) -> None:
+        """Fetch, review and report a single file, pushing progress onto the queue."""
+        async with semaphore:
+            try:
+                # One record per file; the fields also land in JSON logs
+                logger.info("Processing %s", file_path, extra={"file": file_path, "ext": extension, "phase": "start"})
+                request = await self._review_request(github, file_path)
+                if request is None:
+                    return
                 
-                # Fetch file content
-                logger.info(f"Fetching content for {file_path}")
-                try:
-                    content = get_pr_file_content(self.state.github, self.state.repo_name, self.state.pr_number, file_path)
-                    if not content:
-                        logger.error(f"Failed to fetch content for {file_path}")
-                        continue
-                        
-                    # Request review
-                    logger.info(f"Requesting review from {extension} expert for {file_path}")
-                    yield f"Analyzing {file_path}"
-                    
-                    response = expert.process_message(Message(
-                        type=MessageType.REVIEW_REQUEST,
-                        content={
-                            'file_path': file_path,
-                            'file_content': content,
-                            'pr_number': self.state.pr_number
-                        },
-                        source='orchestrator'
-                    ))
-                    
-                    # Process expert response
-                    if response.type == MessageType.REVIEW:
-                        logger.info(f"Received review for {file_path}")
-                        if self.state.report_analyzer:
-                            report_responses = self.state.report_analyzer.process_message(response)
-                            
-                            # Process report responses
-                            for report_response in report_responses:
-                                if report_response.type == MessageType.REPORT:
-                                    logger.info("Generated final report")
-                                    report = report_response.content.get('report', '')
-                                    logger.info(f"Report content: {report}")
-                                    
-                                    # Send the full review in one message
-                                    review_message = json.dumps({
-                                        "type": "review",
-                                        "message": report
-                                    })
-                                    logger.info(f"Sending review message: {review_message}")
-                                    yield review_message
-                                    
-                                elif report_response.type == MessageType.ERROR:
-                                    error_msg = report_response.content.get('error', 'Unknown error')
-                                    logger.error(f"Error from ReportAnalyzer: {error_msg}")
-                                    yield f"Error generating report: {error_msg}"
-                    
-                    elif response.type == MessageType.ERROR:
-                        error_msg = response.content.get('error', 'Unknown error')
-                        logger.error(f"Error from {extension} expert: {error_msg}")
-                        yield f"Error analyzing {file_path}: {error_msg}"
-                    
-                except Exception as e:
-                    logger.error(f"Error processing {file_path}: {str(e)}", exc_info=True)
-                    yield f"Error processing {file_path}: {str(e)}"
+                await queue.put(f"Analyzing {file_path}")
+                response = await expert.process_message(request)
+                
+            except Exception as e:
+                logger.error("Error processing %s: %s", file_path, e, exc_info=True)
+                await queue.put(f"Error processing {file_path}: {str(e)}")
+                return
+        
+        for progress in self._review_progress(extension, file_path, response):
+            await queue.put(progress)
     
-    def _init_github(self):
-        """Initialize GitHub client."""
+    async def _prefetch_contents(self, github: AsyncGithub,
+                                 paths: List[str]) -> Tuple[Dict[str, Union[str, bytes]], Set[str]]:
+        """
+        Fetch file contents at the PR head via GraphQL; missing files fall back to REST.
+        
+        Returns the contents by path and the paths GitHub reports as binary.
+        """
+        repo_name, sha = self.state.repo_name, self.state.pr['head']['sha']
+        
+        # Files read recently at this sha (e.g. a re-review) skip the network
+        contents = {}
+        for path in paths:
+            cached = blob_cache.get((repo_name, sha, path))
+            if cached is not None:
+                contents[path] = cached
+        missing = [path for path in paths if path not in contents]
+        if not missing:
+            return contents, set()
+        
+        owner, name = repo_name.split('/', 1)
         try:
-            if not self.state.github:
-                github_token = os.getenv('GITHUB_TOKEN')
-                if not github_token:
-                    raise ValueError("GITHUB_TOKEN environment variable not set")
-                self.state.github = Github(github_token)
-                logger.info("GitHub client initialized")
+            fetched, binary = await fetch_blobs(
+                self.state.github_token, owner, name, sha, missing,
+                session=github.session
+            )
         except Exception as e:
-            logger.error(f"Failed to initialize GitHub client: {str(e)}")
-            raise
+            logger.error("GraphQL prefetch failed, falling back to REST: %s", e)
+            return contents, set()
+        
+        for path, text in fetched.items():
+            blob_cache.set((repo_name, sha, path), text)
+        contents.update(fetched)
+        logger.info("Prefetched %s of %s files (%s cached)", len(contents), len(paths), len(paths) - len(missing))
+        return contents, binary
+    
+    async def _review_request(self, github: AsyncGithub, file_path: str) -> Optional[Message]:
+        """Fetch a file's content and wrap it in a review request, or None if unavailable."""
+        # Prefetched GraphQL blobs arrive as text; REST reads stay raw bytes
+        content: Union[str, bytes, None] = self.state.file_contents.get(file_path)
+        if content is None:
+            content = await get_pr_file_content(
+                github, self.state.repo_name, self.state.pr,
+                self.state.pr_files_by_name, file_path
+            )
+        if not content:
+            logger.error("Failed to fetch content for %s", file_path)
+            return None
+        
+        # REST reads are only reached when GraphQL had no verdict on the file
+        # (e.g. the prefetch failed), so apply git's own binary check: a NUL byte
+        # near the start
+        if isinstance(content, bytes) and b'\0' in content[:BINARY_SNIFF_BYTES]:
+            logger.info("Skipping binary file %s", file_path)
+            return None
+        
+        payload = ReviewRequestPayload(file_path, self.state.pr_number)
+        if isinstance(content, bytes):
+            payload.file_bytes = content
+        else:
+            payload.file_content = content
+        return Message(type=MessageType.REVIEW_REQUEST, content=payload, source='orchestrator')
+    
+    def _review_progress(self, extension: str, file_path: str, response):
+        """Feed an expert response to the report analyzer and yield the progress to stream."""
+        try:
+            if isinstance(response, Exception):
+                raise response
 
-    def _init_agents(self):
-        """Initialize review agents."""
+            # Process expert response
+            if response.type == MessageType.REVIEW:
+                logger.debug("Received review for %s", file_path)
+                if self.state.report_analyzer:
+                    report_responses = self.state.report_analyzer.process_message(response)
+                    
+                    # Process report responses
+                    for report_response in report_responses:
+                        if report_response.type == MessageType.REPORT:
+                            logger.debug("Generated final report")
+                            report = report_response.content.report
+                            self.state.report = report
+                            
+                            # Reports can run to kilobytes of model output, so only at DEBUG
+                            if logger.isEnabledFor(logging.DEBUG):
+                                logger.debug("Report content: %s", report)
+                            
+                            # Stream the review in chunks between start and end markers
+                            yield {"type": "review_start"}
+                            for start in range(0, len(report), REPORT_CHUNK_SIZE):
+                                yield {"type": "review_chunk", "message": report[start:start + REPORT_CHUNK_SIZE]}
+                            yield {"type": "review_end"}
+                            
+                        elif report_response.type == MessageType.ERROR:
+                            error_msg = report_response.content.error
+                            logger.error("Error from ReportAnalyzer: %s", error_msg)
+                            yield f"Error generating report: {error_msg}"
+            
+            elif response.type == MessageType.ERROR:
+                error_msg = response.content.error
+                logger.error("Error from %s expert: %s", extension, error_msg)
+                yield f"Error analyzing {file_path}: {error_msg}"
+            
+        except Exception as e:
+            logger.error("Error processing %s: %s", file_path, e, exc_info=True)
+            yield f"Error processing {file_path}: {str(e)}"
+    
+    async def _batch_review_files(self, github: AsyncGithub, jobs: List, queue: asyncio.Queue) -> None:
+        """Fetch every file concurrently, then review them all in one batch job."""
+        semaphore = asyncio.Semaphore(FILE_REVIEW_CONCURRENCY)
+        
+        async def fetch(file_path: str) -> Optional[Message]:
+            async with semaphore:
+                return await self._review_request(github, file_path)
+        
+        async with asyncio.TaskGroup() as tg:
+            fetches = [tg.create_task(fetch(file_path)) for _, file_path, _ in jobs]
+        
+        pending = []
+        for (extension, file_path, expert), fetched in zip(jobs, fetches):
+            request = fetched.result()
+            if request is not None:
+                await queue.put(f"Analyzing {file_path}")
+                pending.append((extension, file_path, expert, request))
+        
+        if not pending:
+            return
+        
+        await queue.put(f"Submitting {len(pending)} files as a batch review")
+        responses = await self._batch_review(pending)
+        for (extension, file_path, _, _), response in zip(pending, responses):
+            for progress in self._review_progress(extension, file_path, response):
+                await queue.put(progress)
+    
+    async def _batch_review(self, pending: List) -> List:
+        """Review all pending files with one OpenAI Batch API job."""
+        processor = BatchProcessor(get_openai_client(), MODEL)
+        responses = [None] * len(pending)
+        for index, (_, file_path, expert, request) in enumerate(pending):
+            # Content reviewed before does not need to go through the batch
+            responses[index] = expert.cached_review(request)
+            if responses[index] is not None:
+                continue
+            processor.add(
+                str(index),
+                expert.review_messages(file_path, expert.review_text(request)),
+                response_format=RESPONSE_FORMAT
+            )
+        
         try:
-            # Initialize file analyzer if not already initialized
-            if not self.state.file_analyzer:
-                logger.info("Initializing file analyzer")
-                self.state.file_analyzer = FileAnalyzer()
-                
-            # Initialize report analyzer if not already initialized
-            if not self.state.report_analyzer:
-                logger.info("Initializing report analyzer")
-                self.state.report_analyzer = ReportAnalyzer()
-                
-            logger.info("Agents initialized")
+            async with self.batch_wait() if self.batch_wait else contextlib.nullcontext():
+                outputs = await processor.run()
         except Exception as e:
-            logger.error(f"Failed to initialize agents: {str(e)}")
-            raise
+            # A batch that timed out has been cancelled, and one that failed or
+            # expired produced nothing; review the files interactively instead
+            logger.warning("Batch review failed (%r), reviewing %s files interactively", e, len(processor.requests))
+            return await self._interactive_review(pending, responses)
+        
+        for index, (_, _, expert, request) in enumerate(pending):
+            if responses[index] is None and str(index) in outputs:
+                responses[index] = expert.process_batch_output(request, outputs[str(index)])
+        
+        # Requests that failed inside the batch get a second, interactive chance
+        if None in responses:
+            logger.warning("%s batch requests failed, reviewing them interactively", responses.count(None))
+            return await self._interactive_review(pending, responses)
+        return responses
     
-    @staticmethod
-    def _extract_repo_name(pr_url: str) -> str:
-        """Extract repository name from PR URL."""
-        parts = pr_url.split('/')
-        return f"{parts[3]}/{parts[4]}"
+    async def _interactive_review(self, pending: List, responses: List) -> List:
+        """Review the pending files that have no response yet with concurrent requests."""
+        semaphore = asyncio.Semaphore(FILE_REVIEW_CONCURRENCY)
+        
+        async def review(expert: LanguageExpert, request: Message) -> Message:
+            async with semaphore:
+                return await expert.process_message(request)
+        
+        async with asyncio.TaskGroup() as tg:
+            tasks = {
+                index: tg.create_task(review(expert, request))
+                for index, (_, _, expert, request) in enumerate(pending)
+                if responses[index] is None
+            }
+        for index, task in tasks.items():
+            responses[index] = task.result()
+        return responses
     
-    @staticmethod
-    def _extract_pr_number(pr_url: str) -> int:
-        """Extract PR number from PR URL."""
-        return int(pr_url.split('/')[-1])
+    def _init(self):
+        """Initialize the GitHub client and review agents that are not set up yet."""
+        if self.state.github is None:
+            github_token = os.getenv("GITHUB_TOKEN")
+            if not github_token:
+                logger.error("GITHUB_TOKEN not found in environment variables")
+                raise ValueError("GITHUB_TOKEN not found in environment variables")
+            
+            logger.info("Initializing GitHub client")
+            self.state.github = Github(github_token)
+            self.state.github_token = github_token
+        
+        if self.state.file_analyzer is None:
+            logger.info("Initializing file analyzer")
+            self.state.file_analyzer = FileAnalyzer()
+        
+        if self.state.report_analyzer is None:
+            logger.info("Initializing report analyzer")
+            self.state.report_analyzer = ReportAnalyzer()
+        
+        logger.info("Initialization complete")
@@ -0,0 +1,100 @@
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+import math
+import asyncio
+import logging
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+API_URL = "https://api.github.com"
+
+# GitHub serves at most 100 files per page and 3000 files per PR
+PER_PAGE = 100
+MAX_FILE_PAGES = 30
+
+class AsyncGithub:
+    """
+    Minimal async GitHub REST client for the review hot path.
+
+    One aiohttp session is shared by every call, so connections are kept
+    alive between requests. Use it as an async context manager to close the
+    session when done. Responses are returned as the decoded JSON payloads.
+    """
+
+    def __init__(self, token: str):
+        self.token = token
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> 'AsyncGithub':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The shared session, created on first use."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(headers={
+                'Authorization': f'Bearer {self.token}',
+                'Accept': 'application/vnd.github+json',
+                'X-GitHub-Api-Version': '2022-11-28'
+            })
+        return self._session
+
+    async def close(self) -> None:
+        """Close the shared session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def fetch_pr(self, repo: str, number: int) -> Dict[str, Any]:
+        """Fetch a pull request."""
+        return await self._get_json(f"/repos/{repo}/pulls/{number}")
+
+    async def list_files(self, repo: str, number: int, changed_files: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        List the files changed in a pull request.
+
+        With the PR's changed_files count the pages are fetched concurrently;
+        without it they are walked until a short page.
+        """
+        path = f"/repos/{repo}/pulls/{number}/files"
+
+        if changed_files is None:
+            files, page = [], 1
+            while page <= MAX_FILE_PAGES:
+                batch = await self._get_json(path, params={'per_page': PER_PAGE, 'page': page})
+                files.extend(batch)
+                if len(batch) < PER_PAGE:
+                    break
+                page += 1
+            return files
+
+        pages = min(math.ceil(changed_files / PER_PAGE), MAX_FILE_PAGES)
+        batches = await asyncio.gather(*(
+            self._get_json(path, params={'per_page': PER_PAGE, 'page': page})
+            for page in range(1, pages + 1)
+        ))
+        return [f for batch in batches for f in batch]
+
+    async def get_content(self, repo: str, sha: str, path: str) -> Optional[bytes]:
+        """Read a file's raw bytes at a commit, or None if it does not exist or is a directory."""
+        async with self.session.get(
+            f"{API_URL}/repos/{repo}/contents/{quote(path)}",
+            params={'ref': sha},
+            headers={'Accept': 'application/vnd.github.raw'}
+        ) as response:
+            if response.status == 404:
+                return None
+            response.raise_for_status()
+            # Directories come back as a JSON listing rather than raw content
+            if response.content_type == 'application/json':
+                return None
+            return await response.read()
+
+    async def _get_json(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        async with self.session.get(f"{API_URL}{path}", params=params) as response:
+            response.raise_for_status()
+            return await response.json()
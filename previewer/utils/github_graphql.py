@@ -0,0 +1,97 @@
+from typing import Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+GRAPHQL_URL = "https://api.github.com/graphql"
+
+# Aliases per query, kept well under GitHub's node limit
+MAX_ALIASES = 50
+
+async def fetch_blobs(token: str, owner: str, repo: str, sha: str, paths: List[str],
+                      session: Optional[aiohttp.ClientSession] = None) -> Tuple[Dict[str, str], Set[str]]:
+    """
+    Fetch the text of many files at a commit with GitHub GraphQL.
+
+    Each query aliases up to MAX_ALIASES blobs, so N files cost
+    ceil(N / MAX_ALIASES) round-trips instead of N REST calls.
+
+    Args:
+        token: GitHub token
+        owner: Repository owner
+        repo: Repository name
+        sha: Commit to read the files at
+        paths: File paths to fetch
+        session: Optional session to reuse; a temporary one is created otherwise
+
+    Returns:
+        Tuple of (dict mapping path to file text, set of binary paths).
+        Binary files are not worth reviewing, so they are reported apart from
+        truncated, missing or failed files, which are left out of both so the
+        caller can fall back to REST.
+    """
+    if not paths:
+        return {}, set()
+
+    chunks = [paths[i:i + MAX_ALIASES] for i in range(0, len(paths), MAX_ALIASES)]
+
+    async def run(session: aiohttp.ClientSession) -> Tuple[Dict[str, str], Set[str]]:
+        results = await asyncio.gather(
+            *(_fetch_chunk(session, token, owner, repo, sha, chunk) for chunk in chunks),
+            return_exceptions=True
+        )
+        blobs, binary = {}, set()
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                logger.error("GraphQL blob fetch failed for %s files: %s", len(chunk), result)
+                continue
+            blobs.update(result[0])
+            binary.update(result[1])
+        return blobs, binary
+
+    if session is not None:
+        return await run(session)
+    async with aiohttp.ClientSession() as session:
+        return await run(session)
+
+async def _fetch_chunk(session: aiohttp.ClientSession, token: str, owner: str, repo: str,
+                       sha: str, paths: List[str]) -> Tuple[Dict[str, str], Set[str]]:
+    """Fetch one query's worth of blobs."""
+    # Expressions go in as variables so paths never need escaping in the query
+    declarations = ''.join(f', $e{i}: String!' for i in range(len(paths)))
+    fields = '\n'.join(
+        f'f{i}: object(expression: $e{i}) {{ ... on Blob {{ text isBinary isTruncated }} }}'
+        for i in range(len(paths))
+    )
+    query = f"""query($owner: String!, $name: String!{declarations}) {{
+  repository(owner: $owner, name: $name) {{
+{fields}
+  }}
+}}"""
+    variables = {'owner': owner, 'name': repo}
+    variables.update({f'e{i}': f'{sha}:{path}' for i, path in enumerate(paths)})
+
+    async with session.post(
+        GRAPHQL_URL,
+        json={'query': query, 'variables': variables},
+        headers={'Authorization': f'bearer {token}'}
+    ) as response:
+        response.raise_for_status()
+        payload = await response.json()
+
+    if payload.get('errors'):
+        logger.error("GraphQL blob fetch returned errors: %s", payload['errors'])
+    repository = (payload.get('data') or {}).get('repository') or {}
+
+    blobs, binary = {}, set()
+    for i, path in enumerate(paths):
+        blob = repository.get(f'f{i}')
+        if blob and blob.get('isBinary'):
+            binary.add(path)
+            continue
+        if not blob or blob.get('isTruncated') or blob.get('text') is None:
+            continue
+        blobs[path] = blob['text']
+    return blobs, binary
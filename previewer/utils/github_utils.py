@@ -1,11 +1,24 @@
-from typing import List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional, Union
+import os
 import re
 import logging
 from github import Github, GithubException
 from github.PullRequest import PullRequest
+from .cache import TTLCache
+from .github_async import AsyncGithub
 
 logger = logging.getLogger(__name__)
 
+# File contents as fetched (text from GraphQL, bytes from REST) keyed by
+# (repo, sha, path). Blobs at a sha never change, so hits are always safe; the
+# TTL only bounds memory while re-reviews of the same PR still hit.
+blob_cache = TTLCache(
+    maxsize=int(os.getenv("BLOB_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("BLOB_CACHE_TTL", "300"))
+)
+
+_PR_URL_RE = re.compile(r"github\.com/([^/]+)/([^/]+)/pull/(\d+)")
+
 def extract_repo_info(pr_url: str) -> Tuple[str, str, int]:
     """
     Extract repository owner, name and PR number from GitHub PR URL.
@@ -20,17 +33,16 @@ def extract_repo_info(pr_url: str) -> Tuple[str, str, int]:
         >>> extract_repo_info("https://github.com/owner/repo/pull/123")
         ('owner', 'repo', 123)
     """
-    pattern = r"github\.com/([^/]+)/([^/]+)/pull/(\d+)"
-    match = re.search(pattern, pr_url)
+    # A precompiled regex beats hand-rolled str.find/split parsing in CPython;
+    # unpacking groups() in one call is the cheapest way to read the match
+    match = _PR_URL_RE.search(pr_url)
     
     if not match:
         raise ValueError("Invalid GitHub PR URL")
         
-    owner = match.group(1)
-    repo = match.group(2)
-    pr_number = int(match.group(3))
+    owner, repo, pr_number = match.groups()
     
-    return owner, repo, pr_number
+    return owner, repo, int(pr_number)
 
 def get_pr_files(pr: PullRequest) -> List[str]:
     """
@@ -47,7 +59,7 @@ def get_pr_files(pr: PullRequest) -> List[str]:
 def post_pr_comment(github_client: Github, repo_name: str, pr_number: int, comment: str) -> Optional[str]:
     """Post a comment to a PR. Returns comment URL if successful, None if posting not possible."""
     try:
-        logger.info(f"Posting comment to PR #{pr_number} in {repo_name}")
+        logger.info("Posting comment to PR #%s in %s", pr_number, repo_name)
         repo = github_client.get_repo(repo_name)
         pr = repo.get_pull(pr_number)
         comment = pr.create_issue_comment(comment)
@@ -55,36 +67,49 @@ def post_pr_comment(github_client: Github, repo_name: str, pr_number: int, comme
     except GithubException as e:
         if e.status == 403:
             # This is expected for external repos where we only have read access
-            logger.info(f"Cannot post comment to PR #{pr_number} in {repo_name} - repository is read-only (403)")
+            logger.info("Cannot post comment to PR #%s in %s - repository is read-only (403)", pr_number, repo_name)
             return None
         else:
             # Log other GitHub errors as actual errors
-            logger.error(f"Failed to post comment: {e.status} {e.data}")
+            logger.error("Failed to post comment: %s %s", e.status, e.data)
             raise
     except Exception as e:
-        logger.error(f"Failed to post comment: {str(e)}")
+        logger.error("Failed to post comment: %s", e)
         raise
 
-def get_pr_file_content(github_client: Github, repo_name: str, pr_number: int, file_path: str) -> Optional[str]:
-    """Get the content of a file from a PR."""
-    try:
-        repo = github_client.get_repo(repo_name)
-        pr = repo.get_pull(pr_number)
+async def get_pr_file_content(github: AsyncGithub, repo_name: str, pr: Dict[str, Any],
+                              pr_files_by_name: Dict[str, Dict[str, Any]], file_path: str) -> Optional[Union[str, bytes]]:
+    """
+    Get the content of a file from a PR.
+    
+    Args:
+        github: Async GitHub client
+        repo_name: Repository the PR belongs to, as owner/name
+        pr: Pull request payload
+        pr_files_by_name: The PR's files keyed by filename, fetched once per review
+        file_path: Path of the file to read at the PR head
         
-        # Get the file from PR files
-        pr_file = next((f for f in pr.get_files() if f.filename == file_path), None)
-        if not pr_file:
-            logger.error(f"File {file_path} not found in PR #{pr_number}")
-            return None
-            
-        # Get the file content from the PR
-        contents = repo.get_contents(file_path, ref=pr.head.sha)
-        if isinstance(contents, list):
-            logger.error(f"File {file_path} is a directory")
+    Returns:
+        Raw file content (or text already cached from a GraphQL prefetch), or
+        None if it cannot be read. Decoding is left to the consumer, which may
+        only need a prefix.
+    """
+    try:
+        if file_path not in pr_files_by_name:
+            logger.error("File %s not found in PR #%s", file_path, pr['number'])
             return None
-            
-        return contents.decoded_content.decode('utf-8')
+        
+        # Contents at a sha never change, so repeat reads are served from the cache
+        key = (repo_name, pr['head']['sha'], file_path)
+        content = blob_cache.get(key)
+        if content is None:
+            content = await github.get_content(*key)
+            if content is None:
+                logger.error("File %s is a directory or missing", file_path)
+                return None
+            blob_cache.set(key, content)
+        return content
         
     except Exception as e:
-        logger.error(f"Failed to get file content: {str(e)}")
+        logger.error("Failed to get file content: %s", e)
         return None
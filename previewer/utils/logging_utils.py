@@ -1,31 +1,58 @@
 import logging
+import os
 import sys
-from typing import Optional
+from typing import Optional, Set
 
-def setup_logger(name: str, level: Optional[int] = None) -> logging.Logger:
-    """Set up a logger with a specific format and handlers."""
+# Names of loggers that already carry our handler
+_CONFIGURED: Set[str] = set()
+
+def setup_logger(name: str, level: Optional[int] = None, json: Optional[bool] = None) -> logging.Logger:
+    """Set up a logger with a specific format and handlers.
+
+    Each name is configured once; later calls return the same logger and
+    only apply an explicit level. With json=True (default: LOG_JSON env var)
+    records are written as JSON objects including any extra fields.
+    """
     logger = logging.getLogger(name)
     
     if level is not None:
         logger.setLevel(level)
-    else:
-        logger.setLevel(logging.INFO)
+    elif name not in _CONFIGURED:
+        # Default to WARNING so skipped log calls never format their arguments
+        logger.setLevel(os.getenv("LOG_LEVEL", "WARNING").upper())
     
-    # Remove existing handlers to avoid duplicates
-    logger.handlers = []
+    if name in _CONFIGURED:
+        return logger
+    
+    # Replace a handler left by an earlier import (e.g. a module reload), keep any others
+    logger.handlers = [h for h in logger.handlers if not getattr(h, '_previewer', False)]
     
     # Create handlers
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
+    console_handler.setLevel(logging.NOTSET)
+    console_handler._previewer = True
+    
+    if json is None:
+        json = os.getenv("LOG_JSON", "").lower() in ("1", "true", "yes")
     
     # Create formatters and add it to handlers
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    if json:
+        # Only needed for JSON output
+        from pythonjsonlogger import jsonlogger
+        formatter = jsonlogger.JsonFormatter(
+            '%(asctime)s %(name)s %(levelname)s %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+    else:
+        formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
     console_handler.setFormatter(formatter)
     
-    # Add handlers to the logger
+    # Add handlers to the logger; don't also emit through the root logger
     logger.addHandler(console_handler)
+    logger.propagate = False
+    _CONFIGURED.add(name)
     
     return logger
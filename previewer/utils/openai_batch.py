@@ -0,0 +1,107 @@
+from typing import Dict, List, Optional
+import os
+import json
+import asyncio
+import logging
+from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+
+# SDK retries (connection errors, timeouts, 429 and 5xx) for each batch API call
+BATCH_MAX_RETRIES = 2
+
+class BatchProcessor:
+    """Collect chat completion requests and run them through the OpenAI Batch API."""
+
+    def __init__(self, client: AsyncOpenAI, model: str, poll_interval: Optional[float] = None,
+                 timeout: Optional[float] = None):
+        # The shared client leaves retries to its callers; batch calls (upload,
+        # create, polls) are not rate limited per review, so they use the SDK's own
+        self.client = client.with_options(max_retries=BATCH_MAX_RETRIES)
+        self.model = model
+        self.poll_interval = poll_interval or float(os.getenv("OPENAI_BATCH_POLL_INTERVAL", "10"))
+        # Batches may take up to their 24h completion window; callers wait at most this long
+        self.timeout = timeout or float(os.getenv("OPENAI_BATCH_TIMEOUT", "300"))
+        self.requests: List[Dict] = []
+
+    def add(self, custom_id: str, messages: List[Dict[str, str]], **options) -> None:
+        """Queue a chat completion request under a unique id.
+
+        Extra keyword arguments (e.g. response_format) are sent as request body fields.
+        """
+        self.requests.append({
+            'custom_id': custom_id,
+            'method': 'POST',
+            'url': '/v1/chat/completions',
+            'body': {'model': self.model, 'messages': messages, **options}
+        })
+
+    async def run(self) -> Dict[str, str]:
+        """
+        Upload the queued requests as one batch and wait for it to finish.
+
+        Returns:
+            Dict mapping custom_id to the reply text. Requests that failed
+            inside the batch are left out.
+            
+        Raises:
+            TimeoutError: The batch did not finish within timeout seconds.
+            The batch is cancelled whenever the wait ends before it finishes,
+            whether by timeout, cancellation or a polling error.
+        """
+        if not self.requests:
+            return {}
+
+        payload = "\n".join(json.dumps(request) for request in self.requests).encode('utf-8')
+        batch_file = await self.client.files.create(
+            file=('review_batch.jsonl', payload),
+            purpose='batch'
+        )
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint='/v1/chat/completions',
+            completion_window='24h'
+        )
+        logger.info("Submitted batch %s with %s requests", batch.id, len(self.requests))
+
+        try:
+            async with asyncio.timeout(self.timeout):
+                while batch.status not in TERMINAL_STATUSES:
+                    await asyncio.sleep(self.poll_interval)
+                    batch = await self.client.batches.retrieve(batch.id)
+        finally:
+            if batch.status not in TERMINAL_STATUSES:
+                # Nobody will read the results, so stop the batch from running and billing
+                await self._cancel(batch.id)
+
+        if batch.status != 'completed' or not batch.output_file_id:
+            raise RuntimeError(f"Batch {batch.id} finished with status {batch.status}")
+
+        output = await self.client.files.content(batch.output_file_id)
+        return self._parse_output(output.text)
+
+    async def _cancel(self, batch_id: str) -> None:
+        """Cancel a batch, without letting a failure mask the caller's error."""
+        logger.warning("Cancelling batch %s", batch_id)
+        try:
+            # Shielded so a second cancellation cannot abort the request mid-flight
+            await asyncio.shield(self.client.batches.cancel(batch_id))
+        except Exception as e:
+            logger.error("Failed to cancel batch %s: %s", batch_id, e)
+    
+    @staticmethod
+    def _parse_output(text: str) -> Dict[str, str]:
+        """Extract reply text per custom_id from a batch output file."""
+        results = {}
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get('response') or {}
+            if record.get('error') or response.get('status_code') != 200:
+                logger.error("Batch request %s failed: %s", record.get('custom_id'), record.get('error') or response.get('status_code'))
+                continue
+            results[record['custom_id']] = response['body']['choices'][0]['message']['content']
+        return results
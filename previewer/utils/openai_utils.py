@@ -0,0 +1,27 @@
+from typing import Optional
+import os
+import httpx
+from openai import AsyncOpenAI
+
+# Shared across all agents so concurrent requests multiplex over one
+# HTTP/2 connection pool instead of opening a connection per call
+_client: Optional[AsyncOpenAI] = None
+
+def get_openai_client() -> AsyncOpenAI:
+    """Return the process-wide OpenAI client, creating it on first use."""
+    global _client
+    if _client is None:
+        openai_api_key = os.getenv("OPENAI_API_KEY")
+        if not openai_api_key:
+            raise ValueError("OPENAI_API_KEY environment variable not set")
+        _client = AsyncOpenAI(
+            api_key=openai_api_key,
+            # Retries are left to each call site (tenacity for completions, the
+            # batch processor's own client options), so no error is retried twice
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+            )
+        )
+    return _client